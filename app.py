@@ -195,7 +195,7 @@ def ask():
     except Exception as e:
         logger.error(f"Error using engineering model: {str(e)}")
         # Fallback to basic model
-        response = model.generate_response(user_message, specialized_prompt=specialized_prompt)
+        response = model.generate_response(user_message, specialized_prompt=specialized_prompt, domain=domain)
     
     # Store question and response in database
     new_question = Question(
@@ -295,7 +295,7 @@ def chat():
         except Exception as e:
             logger.error(f"Error using engineering model: {str(e)}")
             # Fallback to basic model
-            response = model.generate_response(user_message, context, specialized_prompt)
+            response = model.generate_response(user_message, context, specialized_prompt, domain)
         
         # Store in database
         new_question = Question(
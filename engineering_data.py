@@ -9,6 +9,10 @@ It provides expert information for common mechanical engineering topics, especia
 - Design specifications
 """
 
+import re
+import sys
+from functools import lru_cache
+
 # Manufacturing Processes Database
 MANUFACTURING_PROCESSES = {
     "CNC_MACHINING": {
@@ -148,7 +152,12 @@ CNC_CODES = {
         "G42": "Tool radius compensation right",
         "G43": "Tool height offset compensation positive",
         "G49": "Tool height offset cancel",
-        "G54-G59": "Work coordinate systems",
+        "G54": "Work coordinate system 1",
+        "G55": "Work coordinate system 2",
+        "G56": "Work coordinate system 3",
+        "G57": "Work coordinate system 4",
+        "G58": "Work coordinate system 5",
+        "G59": "Work coordinate system 6",
         "G80": "Cancel canned cycle",
         "G81": "Drilling cycle",
         "G82": "Drilling cycle with dwell",
@@ -303,6 +312,59 @@ PUNE_MANUFACTURING = {
     }
 }
 
+# Identical string sequences across the databases share one tuple
+_SHARED_SEQUENCES = {}
+
+def _intern_sequences(node):
+    """Replace list values in a nested dict with shared tuples of interned strings."""
+    for key, value in node.items():
+        if isinstance(value, dict):
+            _intern_sequences(value)
+        elif isinstance(value, list):
+            items = tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+            node[key] = _SHARED_SEQUENCES.setdefault(items, items)
+
+_intern_sequences(MANUFACTURING_PROCESSES)
+_intern_sequences(MATERIALS_DATABASE)
+
+# Tool suppliers shared by every recommendation
+_SUPPLIERS = ("Sandvik Coromant", "Kennametal", "Mitsubishi", "Taegutec")
+_INDIAN_SUPPLIERS = ("Miranda Tools", "Addison & Co", "ISCAR India", "Forbes & Company")
+
+# Machine-specific tooling notes
+_MACHINE_NOTES = {
+    "LMW_LX20T": (
+        "Use toolholders compatible with the LMW LX20T quick-change system",
+        "Recommended insert sizes: CNMG 12, TNMG 16, DNMG 15",
+        "Use external coolant supply for better chip evacuation"
+    )
+}
+
+# Alternate spellings that share cutting data with a canonical material
+_MATERIAL_ALIASES = {
+    "CARBON_STEEL": "MILD_STEEL",
+    "ALUMINIUM": "ALUMINUM"
+}
+
+@lru_cache(maxsize=64)
+def _canon_material(material):
+    """Normalize a material name (case, spacing, spelling) to its database key."""
+    material = material.strip().upper().replace(" ", "_")
+    return _MATERIAL_ALIASES.get(material, material)
+
+# (process, material) -> (tool type, cutting parameters)
+_TOOLING_TABLE = {
+    ("TURNING", "MILD_STEEL"): ("Carbide inserts CNMG/TNMG, grade P20/P30", CUTTING_PARAMETERS["TURNING"]["MILD_STEEL"]["CARBIDE"]),
+    ("TURNING", "STAINLESS_STEEL"): ("Carbide inserts CNMG/DNMG, grade M20/M30", CUTTING_PARAMETERS["TURNING"]["STAINLESS_STEEL"]["CARBIDE"]),
+    ("TURNING", "ALUMINUM"): ("Carbide inserts CCMT/DCMT, grade K10/K20", CUTTING_PARAMETERS["TURNING"]["ALUMINUM"]["CARBIDE"]),
+    ("MILLING", "MILD_STEEL"): ("Carbide end mills, 4-flute for steel", CUTTING_PARAMETERS["MILLING"]["MILD_STEEL"]["CARBIDE"]),
+    ("MILLING", "STAINLESS_STEEL"): ("Carbide end mills, special geometry for stainless", CUTTING_PARAMETERS["MILLING"]["STAINLESS_STEEL"]["CARBIDE"]),
+    ("MILLING", "ALUMINUM"): ("Carbide end mills, 2-3 flute for aluminum", CUTTING_PARAMETERS["MILLING"]["ALUMINUM"]["CARBIDE"]),
+    ("DRILLING", "MILD_STEEL"): ("HSS or Carbide-tipped drills", CUTTING_PARAMETERS["DRILLING"]["MILD_STEEL"]["HSS"]),
+    ("DRILLING", "STAINLESS_STEEL"): ("Cobalt HSS or Carbide drills", CUTTING_PARAMETERS["DRILLING"]["STAINLESS_STEEL"]["HSS"]),
+    ("DRILLING", "ALUMINUM"): ("HSS drills with 130° point angle", CUTTING_PARAMETERS["DRILLING"]["ALUMINUM"]["HSS"])
+}
+
 # Function to get tool bit recommendations based on material and process
 def get_tooling_recommendation(material, process, machine_type=None):
     """
@@ -319,56 +381,84 @@ def get_tooling_recommendation(material, process, machine_type=None):
     recommendations = {
         "tool_type": None,
         "cutting_parameters": None,
-        "supplier_options": ["Sandvik Coromant", "Kennametal", "Mitsubishi", "Taegutec"],
-        "indian_suppliers": ["Miranda Tools", "Addison & Co", "ISCAR India", "Forbes & Company"]
+        "supplier_options": _SUPPLIERS,
+        "indian_suppliers": _INDIAN_SUPPLIERS
     }
     
     # Lookup material and process
-    material = material.upper()
-    process = process.upper()
+    tooling = _TOOLING_TABLE.get((process.upper(), _canon_material(material)))
+    if tooling:
+        recommendations["tool_type"], recommendations["cutting_parameters"] = tooling
     
-    if process == "TURNING":
-        if material == "MILD_STEEL" or material == "CARBON_STEEL":
-            recommendations["tool_type"] = "Carbide inserts CNMG/TNMG, grade P20/P30"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["TURNING"]["MILD_STEEL"]["CARBIDE"]
-        elif material == "STAINLESS_STEEL":
-            recommendations["tool_type"] = "Carbide inserts CNMG/DNMG, grade M20/M30"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["TURNING"]["STAINLESS_STEEL"]["CARBIDE"]
-        elif material == "ALUMINUM" or material == "ALUMINIUM":
-            recommendations["tool_type"] = "Carbide inserts CCMT/DCMT, grade K10/K20"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["TURNING"]["ALUMINUM"]["CARBIDE"]
+    # Machine-specific recommendations
+    if machine_type in _MACHINE_NOTES:
+        recommendations["specific_notes"] = _MACHINE_NOTES[machine_type]
     
-    elif process == "MILLING":
-        if material == "MILD_STEEL" or material == "CARBON_STEEL":
-            recommendations["tool_type"] = "Carbide end mills, 4-flute for steel"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["MILLING"]["MILD_STEEL"]["CARBIDE"]
-        elif material == "STAINLESS_STEEL":
-            recommendations["tool_type"] = "Carbide end mills, special geometry for stainless"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["MILLING"]["STAINLESS_STEEL"]["CARBIDE"]
-        elif material == "ALUMINUM" or material == "ALUMINIUM":
-            recommendations["tool_type"] = "Carbide end mills, 2-3 flute for aluminum"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["MILLING"]["ALUMINUM"]["CARBIDE"]
+    return recommendations
+
+# Leading number of a parameter string such as "60-120 m/min" or "0.2 mm/rev"
+_RANGE_LOW_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+def _range_low(value):
+    """Return the low end of a numeric range string as a float."""
+    return float(_RANGE_LOW_PATTERN.search(value).group())
+
+# Static header and footer shared by every generated turning program
+_GCODE_HEADER = """G21 G40 G95 (MM, TOOL COMP CANCEL, FEED PER REV)
+G28 U0 W0 (HOME POSITION RETURN)
+T0101 (TOOL SELECTION AND OFFSET)
+"""
+_GCODE_FOOTER = """G00 Z5.0 (RAPID TO Z5.0)
+G28 U0 W0 (HOME POSITION RETURN)
+M30 (END OF PROGRAM)
+%"""
+
+@lru_cache(maxsize=32)
+def _gcode_prefix(material):
+    """Return the program header for a material, built once per material."""
+    return f"% \nO1000 (TURNING PROGRAM FOR {material})\n{_GCODE_HEADER}"
+
+@lru_cache(maxsize=256)
+def _turning_program(material, diameter, length):
+    """
+    Build a turning program; cached on (material, diameter, length).
     
-    elif process == "DRILLING":
-        if material == "MILD_STEEL" or material == "CARBON_STEEL":
-            recommendations["tool_type"] = "HSS or Carbide-tipped drills"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["DRILLING"]["MILD_STEEL"]["HSS"]
-        elif material == "STAINLESS_STEEL":
-            recommendations["tool_type"] = "Cobalt HSS or Carbide drills"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["DRILLING"]["STAINLESS_STEEL"]["HSS"]
-        elif material == "ALUMINUM" or material == "ALUMINIUM":
-            recommendations["tool_type"] = "HSS drills with 130° point angle"
-            recommendations["cutting_parameters"] = CUTTING_PARAMETERS["DRILLING"]["ALUMINUM"]["HSS"]
+    Args:
+        material: Canonical material name (see _canon_material)
+        diameter: Workpiece diameter as a float
+        length: Workpiece length exactly as it should appear in the program
+        
+    Returns:
+        String containing G-code program
+    """
+    # Get cutting parameters based on material
+    if material in CUTTING_PARAMETERS["TURNING"]:
+        cutting_params = CUTTING_PARAMETERS["TURNING"][material]["CARBIDE"]
+    else:
+        cutting_params = {"cutting_speed": "80 m/min", "feed": "0.2 mm/rev", "doc": "2 mm"}
     
-    # Machine-specific recommendations
-    if machine_type == "LMW_LX20T":
-        recommendations["specific_notes"] = [
-            "Use toolholders compatible with the LMW LX20T quick-change system",
-            "Recommended insert sizes: CNMG 12, TNMG 16, DNMG 15",
-            "Use external coolant supply for better chip evacuation"
-        ]
+    # Extract the low end of each parameter range
+    cutting_speed = int(_range_low(cutting_params["cutting_speed"]))
+    feed_rate = _range_low(cutting_params["feed"])
     
-    return recommendations
+    # Calculate spindle speed based on cutting speed and diameter
+    spindle_speed = int((cutting_speed * 1000) / (3.14159 * diameter))
+    if spindle_speed > 3000:
+        spindle_speed = 3000  # Cap at 3000 RPM for safety
+    
+    # Only the motion block depends on the part geometry
+    motion = f"""G50 S{spindle_speed} (MAX SPINDLE SPEED LIMIT)
+G96 S{cutting_speed} M03 (CONSTANT SURFACE SPEED, SPINDLE ON CW)
+G00 X{diameter + 5.0} Z5.0 (RAPID TO POSITION)
+G01 Z0 F{feed_rate} (LINEAR FEED TO Z0)
+G01 X{diameter - 2.0} F{feed_rate} (FACING CUT)
+G00 X{diameter} (RAPID TO DIAMETER)
+G00 Z2.0 (RAPID TO Z2.0)
+G01 Z-{length} F{feed_rate} (TURNING TO LENGTH)
+G00 X{diameter + 5.0} (RAPID AWAY FROM PART)
+"""
+    
+    return "".join((_gcode_prefix(material), motion, _GCODE_FOOTER))
 
 # Function to generate basic G-code for a simple turning operation
 def generate_simple_gcode(operation_type, material, diameter, length):
@@ -385,55 +475,23 @@ def generate_simple_gcode(operation_type, material, diameter, length):
         String containing G-code program
     """
     if operation_type.upper() == "TURNING":
-        # Get cutting parameters based on material
-        material = material.upper()
-        cutting_params = None
-        
-        if material == "MILD_STEEL" or material == "CARBON_STEEL":
-            cutting_params = CUTTING_PARAMETERS["TURNING"]["MILD_STEEL"]["CARBIDE"]
-        elif material == "STAINLESS_STEEL":
-            cutting_params = CUTTING_PARAMETERS["TURNING"]["STAINLESS_STEEL"]["CARBIDE"]
-        elif material == "ALUMINUM" or material == "ALUMINIUM":
-            cutting_params = CUTTING_PARAMETERS["TURNING"]["ALUMINUM"]["CARBIDE"]
-        else:
-            cutting_params = {"cutting_speed": "80 m/min", "feed": "0.2 mm/rev", "doc": "2 mm"}
-        
-        # Extract values from cutting parameters
-        cutting_speed = cutting_params["cutting_speed"].split("-")[0].strip()
-        if "m/min" in cutting_speed:
-            cutting_speed = cutting_speed.replace("m/min", "").strip()
-        cutting_speed = int(cutting_speed)
-        
-        feed_rate = cutting_params["feed"].split("-")[0].strip()
-        if "mm/rev" in feed_rate:
-            feed_rate = feed_rate.replace("mm/rev", "").strip()
-        feed_rate = float(feed_rate)
-        
-        # Calculate spindle speed based on cutting speed and diameter
-        spindle_speed = int((cutting_speed * 1000) / (3.14159 * float(diameter)))
-        if spindle_speed > 3000:
-            spindle_speed = 3000  # Cap at 3000 RPM for safety
-        
-        # Generate G-code
-        gcode = f"""% 
-O1000 (TURNING PROGRAM FOR {material})
-G21 G40 G95 (MM, TOOL COMP CANCEL, FEED PER REV)
-G28 U0 W0 (HOME POSITION RETURN)
-T0101 (TOOL SELECTION AND OFFSET)
-G50 S{spindle_speed} (MAX SPINDLE SPEED LIMIT)
-G96 S{cutting_speed} M03 (CONSTANT SURFACE SPEED, SPINDLE ON CW)
-G00 X{float(diameter) + 5.0} Z5.0 (RAPID TO POSITION)
-G01 Z0 F{feed_rate} (LINEAR FEED TO Z0)
-G01 X{float(diameter) - 2.0} F{feed_rate} (FACING CUT)
-G00 X{float(diameter)} (RAPID TO DIAMETER)
-G00 Z2.0 (RAPID TO Z2.0)
-G01 Z-{length} F{feed_rate} (TURNING TO LENGTH)
-G00 X{float(diameter) + 5.0} (RAPID AWAY FROM PART)
-G00 Z5.0 (RAPID TO Z5.0)
-G28 U0 W0 (HOME POSITION RETURN)
-M30 (END OF PROGRAM)
-%"""
-        
-        return gcode
+        # Length is keyed by its rendered text so 40 and 40.0 stay distinct
+        return _turning_program(_canon_material(material), float(diameter), str(length))
     
-    return "Operation type not supported for G-code generation."
\ No newline at end of file
+    return "Operation type not supported for G-code generation."
+
+# Flat, upper-case code -> description table covering both G-codes and M-codes
+_CODE_LOOKUP = {**CNC_CODES["G_CODES"], **CNC_CODES["M_CODES"]}
+
+# Function to look up the meaning of a G-code or M-code
+def lookup_code(code):
+    """
+    Looks up a FANUC G-code or M-code description.
+    
+    Args:
+        code: The code to look up, e.g. "G83" or "m30" (case-insensitive)
+        
+    Returns:
+        Description string, or None if the code is unknown
+    """
+    return _CODE_LOOKUP.get(code.strip().upper())
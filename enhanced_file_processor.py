@@ -7,38 +7,95 @@ without requiring API keys.
 import os
 import logging
 import base64
-from io import BytesIO
 from typing import Dict, Any, List, Optional, Tuple
 import re
 import json
+import copy
+import hashlib
+import threading
+import heapq
+from operator import itemgetter
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice, repeat
 from PIL import Image
-import pytesseract
+try:
+    # In-process tesseract bindings; avoid spawning a subprocess per image
+    from tesserocr import PyTessBaseAPI, PSM
+except ImportError:
+    PyTessBaseAPI = None
+    import pytesseract
 import fitz  # PyMuPDF
-from pdf2image import convert_from_path
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+from free_file_processor import PARALLEL_PAGE_THRESHOLD
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Logging is configured by the application entry point
 logger = logging.getLogger(__name__)
 
 # Constants
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
 UPLOAD_FOLDER = 'uploads'
+# Longest image side fed to OCR; larger images cost time without improving accuracy
+OCR_MAX_DIMENSION = 2500
 
-# Download NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+# Worker processes for long PDFs, created on first use and shared by all requests
+_executor = None
+_executor_lock = threading.Lock()
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+# Processed results keyed by (SHA-256 of contents, extension), least recently used first.
+# Entries hold full text and base64 images, so the cache is bounded by their total size too.
+PROCESSED_CACHE_SIZE = 32
+PROCESSED_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_processed_cache = OrderedDict()
+_processed_cache_bytes = 0
+_processed_cache_lock = threading.Lock()
+
+# Terminology used to classify PDF documents
+_CAD_TERMS = frozenset({"drawing", "diagram", "blueprint", "plan", "model", "design",
+                        "assembly", "component", "part", "view", "section", "dimension"})
+_ENGINEERING_TERMS = frozenset({"material", "steel", "aluminum", "tolerance", "specification",
+                                "standard", "manufacturing", "process", "cnc", "machining"})
+# Longest terms first so no term is shadowed by a shorter prefix
+_DOCUMENT_TERM_PATTERN = re.compile("|".join(
+    re.escape(term) for term in sorted(_CAD_TERMS | _ENGINEERING_TERMS, key=len, reverse=True)))
+
+# Numeric dimensions with a length unit, e.g. "25 mm" or "1.5in"
+_DIMENSION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(?:mm|cm|m|inch|in)\b')
+
+# Keyword extraction: alphabetic tokens of two or more letters, minus stopwords
+_WORD_PATTERN = re.compile(r"[a-z]{2,}")
+
+# Engineering-specific keywords to emphasize in extract_engineering_keywords
+_KEYWORD_WEIGHTS = {
+    "manufacturing": 2.0, "machining": 2.0, "cnc": 2.0, "tooling": 2.0,
+    "material": 2.0, "steel": 1.5, "aluminum": 1.5, "plastic": 1.5,
+    "design": 1.5, "mechanical": 1.5, "engineering": 1.5, "tolerance": 2.0,
+    "dimension": 1.5, "assembly": 1.5, "drawing": 1.5, "specification": 2.0,
+    "process": 1.5, "production": 1.5, "quality": 1.5, "testing": 1.5,
+    "standard": 2.0, "code": 1.5, "regulation": 1.5, "compliance": 1.5,
+    "simulation": 2.0, "analysis": 1.5, "calculation": 1.5, "prototype": 1.5,
+    "measurement": 1.5, "instrument": 1.5, "sensor": 1.5, "control": 1.5,
+    "3d printing": 2.0, "additive": 2.0, "subtractive": 2.0, "forming": 1.5,
+    "heat treatment": 2.0, "casting": 1.5, "forging": 1.5, "welding": 1.5
+}
+
+@lru_cache(maxsize=1)
+def _get_stopwords() -> frozenset:
+    """
+    Load the NLTK English stopwords on first use.
+    
+    NLTK is imported here rather than at module level so processes that
+    never extract keywords (e.g. PDF worker processes) skip its import cost.
+    """
+    import nltk
+    from nltk.corpus import stopwords
+    
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('stopwords')
+    return frozenset(stopwords.words('english'))
 
 def allowed_file(filename: str) -> bool:
     """Check if the file extension is allowed."""
@@ -56,10 +113,28 @@ def save_uploaded_file(file, filename: str) -> str:
     file.save(filepath)
     return filepath
 
+def _data_uri(raw: bytes, mime: str) -> str:
+    """Build an image data URI; base64 output is pure ASCII, so decode it as such."""
+    return "data:image/" + mime + ";base64," + base64.b64encode(raw).decode('ascii')
+
+# One tesseract API handle per thread; language data is loaded only once per handle
+_tess_local = threading.local()
+
+def _get_tess_api():
+    """Return this thread's tesserocr API handle, creating it on first use."""
+    api = getattr(_tess_local, "api", None)
+    if api is None:
+        api = PyTessBaseAPI(psm=PSM.AUTO, lang='eng')
+        _tess_local.api = api
+    return api
+
 def extract_text_from_image(img) -> str:
     """
     Extract text from an image using OCR.
     
+    Uses the in-process tesserocr API when it is installed and falls back
+    to pytesseract (one tesseract subprocess per call) otherwise.
+    
     Args:
         img: PIL Image object
         
@@ -67,13 +142,22 @@ def extract_text_from_image(img) -> str:
         Extracted text string
     """
     try:
-        text = pytesseract.image_to_string(img)
+        if max(img.size) > OCR_MAX_DIMENSION:
+            img = img.copy()
+            img.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+        
+        if PyTessBaseAPI is not None:
+            api = _get_tess_api()
+            api.SetImage(img)
+            text = api.GetUTF8Text()
+        else:
+            text = pytesseract.image_to_string(img)
         return text.strip()
     except Exception as e:
         logger.error(f"OCR error: {str(e)}")
         return ""
 
-def analyze_image_content(img) -> Dict[str, Any]:
+def analyze_image_content(img) -> Tuple[Dict[str, Any], Any]:
     """
     Perform basic image analysis to identify engineering drawings or diagrams.
     
@@ -81,7 +165,8 @@ def analyze_image_content(img) -> Dict[str, Any]:
         img: PIL Image object
         
     Returns:
-        Dictionary with image analysis results
+        Tuple of (analysis results dict, grayscale PIL Image) so callers can
+        reuse the grayscale conversion, e.g. as OCR input
     """
     result = {}
     
@@ -100,9 +185,12 @@ def analyze_image_content(img) -> Dict[str, Any]:
         # Convert to numpy array for analysis
         img_array = np.array(gray_img)
         
-        # Calculate basic image statistics
-        std_dev = np.std(img_array)
-        mean_value = np.mean(img_array)
+        # Calculate basic image statistics from a 256-bin histogram: one pass
+        # over the pixels, then mean and standard deviation over the bins only
+        hist = np.bincount(img_array.ravel(), minlength=256)
+        levels = np.arange(256)
+        mean_value = (hist * levels).sum() / img_array.size
+        std_dev = np.sqrt((hist * (levels - mean_value) ** 2).sum() / img_array.size)
         
         # Technical drawings often have high contrast with clear lines
         if std_dev > 40 and (mean_value > 180 or mean_value < 100):
@@ -113,7 +201,7 @@ def analyze_image_content(img) -> Dict[str, Any]:
         logger.error(f"Image analysis error: {str(e)}")
         result["image_type"] = "Unable to determine image type"
     
-    return result
+    return result, gray_img
 
 def process_image_file(filepath: str) -> Dict[str, Any]:
     """
@@ -134,33 +222,43 @@ def process_image_file(filepath: str) -> Dict[str, Any]:
     try:
         # Open and process the image
         with Image.open(filepath) as img:
+            # Record the original metadata before any reduced-size decoding
+            width, height = img.size
+            format_type = img.format
+            mode = img.mode
+            
+            # Let the JPEG decoder produce a smaller grayscale image directly
+            # when the full resolution would only be thrown away for OCR
+            if format_type == 'JPEG' and max(width, height) > OCR_MAX_DIMENSION:
+                img.draft('L', (OCR_MAX_DIMENSION, OCR_MAX_DIMENSION))
+            
+            # Analyze image content first; its grayscale copy doubles as OCR input
+            result["analysis"], gray_img = analyze_image_content(img)
+            result["analysis"]["dimensions"] = f"{width}x{height}"
+            
             # Extract text with OCR
-            extracted_text = extract_text_from_image(img)
+            extracted_text = extract_text_from_image(gray_img)
             if extracted_text:
                 result["text"] = extracted_text
             
-            # Analyze image content
-            result["analysis"] = analyze_image_content(img)
-            
             # Add basic image metadata
-            format_type = img.format
-            mode = img.mode
             result["analysis"]["format"] = format_type
             result["analysis"]["mode"] = mode
             
-            # Convert image to base64 for display
-            buffered = BytesIO()
-            img_format = img.format if img.format else 'JPEG'
-            img.save(buffered, format=img_format)
-            img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            # The file on disk is already encoded, so base64 its bytes
+            # directly rather than re-encoding the image through PIL
+            with open(filepath, 'rb') as f:
+                raw = f.read()
+            
+            img_format = format_type if format_type else 'JPEG'
             
             mime_type = 'jpeg' if img_format.lower() == 'jpg' else img_format.lower()
-            img_data = f"data:image/{mime_type};base64,{img_str}"
+            img_data = _data_uri(raw, mime_type)
             
             result["images"].append({
                 "data": img_data,
-                "width": img.width,
-                "height": img.height,
+                "width": width,
+                "height": height,
                 "format": format_type
             })
             
@@ -170,63 +268,114 @@ def process_image_file(filepath: str) -> Dict[str, Any]:
     
     return result
 
+def _extract_page(pdf_document, page_num: int) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Extract text and images from a single page of an open PDF.
+    
+    Args:
+        pdf_document: Open fitz document
+        page_num: Zero-based page index
+        
+    Returns:
+        Tuple containing (page text, list of image data dictionaries)
+    """
+    page = pdf_document[page_num]
+    page_text = page.get_text()
+    images = []
+    
+    for img_index, img_info in enumerate(page.get_images(full=True)):
+        try:
+            xref = img_info[0]
+            base_image = pdf_document.extract_image(xref)
+            image_bytes = base_image["image"]
+            image_ext = base_image["ext"]
+            
+            # The extracted bytes are already encoded in image_ext, so
+            # base64 them directly instead of re-encoding through PIL
+            img_data = _data_uri(image_bytes, image_ext)
+            
+            images.append({
+                "data": img_data,
+                "width": base_image["width"],
+                "height": base_image["height"],
+                "format": image_ext.upper(),
+                "page": page_num + 1,
+                "index": img_index + 1
+            })
+        except Exception as e:
+            logger.error(f"Error extracting image {img_index} from page {page_num + 1}: {str(e)}")
+    
+    return page_text, images
+
+def _extract_page_range(filepath: str, start: int, stop: int) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Extract pages [start, stop); run in worker processes, which need their own handle."""
+    with fitz.open(filepath) as pdf_document:
+        return [_extract_page(pdf_document, page_num) for page_num in range(start, stop)]
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Return the shared worker pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return _executor
+
+def rasterize_page(pdf_document, page_num: int, dpi: int = 200) -> Image.Image:
+    """
+    Render a PDF page to a PIL image in-process with PyMuPDF.
+
+    Args:
+        pdf_document: Open fitz document
+        page_num: Zero-based page index
+        dpi: Output resolution
+
+    Returns:
+        RGB PIL Image of the rendered page
+    """
+    zoom = dpi / 72
+    pix = pdf_document[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
 def extract_text_from_pdf(filepath: str) -> Tuple[str, List[Dict[str, Any]]]:
     """
     Extract text and images from a PDF file.
     
+    Documents with PARALLEL_PAGE_THRESHOLD or more pages are split into one
+    contiguous page range per worker of a shared process pool, so each
+    worker opens the document once.
+    
     Args:
         filepath: Path to the PDF file
         
     Returns:
         Tuple containing (extracted text, list of image data dictionaries)
     """
-    extracted_text = ""
+    page_texts = []
     images = []
     
     try:
         # Open the PDF
         pdf_document = fitz.open(filepath)
+        page_count = pdf_document.page_count
         
-        # Extract text and images from each page
-        for page_num, page in enumerate(pdf_document):
-            # Extract text
-            page_text = page.get_text()
-            extracted_text += f"\n--- Page {page_num + 1} ---\n{page_text}"
-            
-            # Extract images
-            image_list = page.get_images(full=True)
-            
-            for img_index, img_info in enumerate(image_list):
-                try:
-                    xref = img_info[0]
-                    base_image = pdf_document.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image_ext = base_image["ext"]
-                    
-                    # Convert to PIL Image
-                    image = Image.open(BytesIO(image_bytes))
-                    
-                    # Convert to base64
-                    buffered = BytesIO()
-                    image.save(buffered, format=image_ext.upper())
-                    img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                    img_data = f"data:image/{image_ext};base64,{img_str}"
-                    
-                    images.append({
-                        "data": img_data,
-                        "width": image.width,
-                        "height": image.height,
-                        "format": image_ext.upper(),
-                        "page": page_num + 1
-                    })
-                except Exception as e:
-                    logger.error(f"Error extracting image {img_index} from page {page_num + 1}: {str(e)}")
+        if page_count >= PARALLEL_PAGE_THRESHOLD:
+            pdf_document.close()
+            workers = min(os.cpu_count() or 1, page_count)
+            bounds = [page_count * i // workers for i in range(workers + 1)]
+            chunks = _get_executor().map(_extract_page_range, repeat(filepath), bounds[:-1], bounds[1:])
+            page_results = [page for chunk in chunks for page in chunk]
+        else:
+            page_results = [_extract_page(pdf_document, page_num) for page_num in range(page_count)]
+            pdf_document.close()
         
-        pdf_document.close()
+        # Results come back in page order
+        for page_num, (page_text, page_images) in enumerate(page_results):
+            page_texts.append(f"--- Page {page_num + 1} ---\n{page_text}")
+            images.extend(page_images)
     except Exception as e:
         logger.error(f"Error processing PDF: {str(e)}")
     
-    return extracted_text.strip(), images
+    return "\n".join(page_texts).strip(), images
 
 def extract_metadata_from_pdf(filepath: str) -> Dict[str, Any]:
     """
@@ -290,14 +439,10 @@ def process_pdf_file(filepath: str) -> Dict[str, Any]:
             word_count = len(extracted_text.split())
             result["analysis"]["word_count"] = word_count
             
-            # Check for CAD terminology
-            cad_terms = ["drawing", "diagram", "blueprint", "plan", "model", "design", 
-                        "assembly", "component", "part", "view", "section", "dimension"]
-            cad_count = sum(1 for term in cad_terms if term in extracted_text.lower())
-            
-            engineering_terms = ["material", "steel", "aluminum", "tolerance", "specification",
-                                "standard", "manufacturing", "process", "cnc", "machining"]
-            engineering_count = sum(1 for term in engineering_terms if term in extracted_text.lower())
+            # Check for CAD and engineering terminology in one scan of the text
+            found_terms = set(_DOCUMENT_TERM_PATTERN.findall(extracted_text.lower()))
+            cad_count = len(found_terms & _CAD_TERMS)
+            engineering_count = len(found_terms & _ENGINEERING_TERMS)
             
             # Make basic classification
             if cad_count > 3:
@@ -307,11 +452,10 @@ def process_pdf_file(filepath: str) -> Dict[str, Any]:
             else:
                 result["analysis"]["document_type"] = "General document"
                 
-            # Extract dimensions if present (using regex patterns)
-            dimension_pattern = r'(\d+(?:\.\d+)?)\s*(?:mm|cm|m|inch|in)\b'
-            dimensions = re.findall(dimension_pattern, extracted_text)
+            # Extract dimensions if present, stopping after the first 10 matches
+            dimensions = [match.group(1) for match in islice(_DIMENSION_PATTERN.finditer(extracted_text), 10)]
             if dimensions:
-                result["analysis"]["detected_dimensions"] = dimensions[:10]  # Limit to first 10
+                result["analysis"]["detected_dimensions"] = dimensions
                 
     except Exception as e:
         logger.error(f"Error processing PDF: {str(e)}")
@@ -319,24 +463,72 @@ def process_pdf_file(filepath: str) -> Dict[str, Any]:
     
     return result
 
+def _file_digest(filepath: str) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    with open(filepath, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def _payload_size(value: Any) -> int:
+    """Approximate the bytes held by a processing result's strings and binary data."""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_payload_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(item) for item in value)
+    return 0
+
 def process_file(filepath: str) -> Dict[str, Any]:
     """
     Process a file based on its extension with enhanced capabilities.
     
+    Results are cached by file content, so re-uploading the same document
+    skips OCR and PDF parsing entirely.
+    
     Args:
         filepath: Path to the file
         
     Returns:
         Dict with extracted content
     """
+    global _processed_cache_bytes
     file_ext = filepath.rsplit('.', 1)[1].lower() if '.' in filepath else ''
     
     if file_ext in ['jpg', 'jpeg', 'png']:
-        return process_image_file(filepath)
+        processor = process_image_file
     elif file_ext == 'pdf':
-        return process_pdf_file(filepath)
+        processor = process_pdf_file
     else:
         return {"error": f"Unsupported file type: {file_ext}"}
+    
+    try:
+        cache_key = (_file_digest(filepath), file_ext)
+    except OSError as e:
+        logger.error(f"Error hashing file: {str(e)}")
+        return processor(filepath)
+    
+    with _processed_cache_lock:
+        cached = _processed_cache.get(cache_key)
+        if cached is not None:
+            _processed_cache.move_to_end(cache_key)
+            return copy.deepcopy(cached[0])
+    
+    result = processor(filepath)
+    
+    # Only cache successful results so transient failures can be retried, and
+    # skip any result that alone would take more than half the byte budget
+    size = _payload_size(result)
+    if "error" not in result and size <= PROCESSED_CACHE_MAX_BYTES // 2:
+        with _processed_cache_lock:
+            previous = _processed_cache.pop(cache_key, None)
+            if previous is not None:
+                _processed_cache_bytes -= previous[1]
+            _processed_cache[cache_key] = (copy.deepcopy(result), size)
+            _processed_cache_bytes += size
+            while len(_processed_cache) > PROCESSED_CACHE_SIZE or _processed_cache_bytes > PROCESSED_CACHE_MAX_BYTES:
+                _processed_cache_bytes -= _processed_cache.popitem(last=False)[1][1]
+    
+    return result
 
 def extract_engineering_keywords(text: str) -> List[str]:
     """
@@ -350,38 +542,18 @@ def extract_engineering_keywords(text: str) -> List[str]:
     """
     try:
         # Tokenize and process text
-        tokens = word_tokenize(text.lower())
-        stop_words = set(stopwords.words('english'))
-        tokens = [word for word in tokens if word.isalpha() and word not in stop_words]
-        
-        # Engineering-specific keywords to emphasize
-        engineering_terms = {
-            "manufacturing": 2.0, "machining": 2.0, "cnc": 2.0, "tooling": 2.0,
-            "material": 2.0, "steel": 1.5, "aluminum": 1.5, "plastic": 1.5,
-            "design": 1.5, "mechanical": 1.5, "engineering": 1.5, "tolerance": 2.0,
-            "dimension": 1.5, "assembly": 1.5, "drawing": 1.5, "specification": 2.0,
-            "process": 1.5, "production": 1.5, "quality": 1.5, "testing": 1.5,
-            "standard": 2.0, "code": 1.5, "regulation": 1.5, "compliance": 1.5,
-            "simulation": 2.0, "analysis": 1.5, "calculation": 1.5, "prototype": 1.5,
-            "measurement": 1.5, "instrument": 1.5, "sensor": 1.5, "control": 1.5,
-            "3d printing": 2.0, "additive": 2.0, "subtractive": 2.0, "forming": 1.5,
-            "heat treatment": 2.0, "casting": 1.5, "forging": 1.5, "welding": 1.5
-        }
+        stop_words = _get_stopwords()
+        tokens = [word for word in _WORD_PATTERN.findall(text.lower()) if word not in stop_words]
         
         # Create document frequency dictionary
-        word_freq = {}
-        for token in tokens:
-            word_freq[token] = word_freq.get(token, 0) + 1
+        word_freq = Counter(tokens)
         
         # Apply engineering term weights
-        weighted_words = []
-        for word, freq in word_freq.items():
-            weight = engineering_terms.get(word, 1.0)
-            weighted_words.append((word, freq * weight))
+        weighted_words = [(word, freq * _KEYWORD_WEIGHTS.get(word, 1.0)) for word, freq in word_freq.items()]
         
-        # Sort by weight and return top keywords
-        weighted_words.sort(key=lambda x: x[1], reverse=True)
-        return [word for word, _ in weighted_words[:20]]
+        # Select the top keywords by weight without sorting the whole vocabulary
+        top_words = heapq.nlargest(20, weighted_words, key=itemgetter(1))
+        return [word for word, _ in top_words]
         
     except Exception as e:
         logger.error(f"Error extracting keywords: {str(e)}")
@@ -420,4 +592,40 @@ def prepare_content_for_model(extracted_content: Dict[str, Any]) -> Dict[str, An
     if "analysis" in extracted_content and extracted_content["analysis"]:
         prepared_content["analysis"] = extracted_content["analysis"]
     
-    return prepared_content
\ No newline at end of file
+    return prepared_content
+
+def prepare_for_claude(extracted_content: Dict) -> List[Dict]:
+    """
+    Prepare extracted content for Claude API.
+    
+    Args:
+        extracted_content: Dict with text and images extracted from a file
+        
+    Returns:
+        List of content parts for Claude's API
+    """
+    content_parts = []
+    
+    # Add text content if available
+    if extracted_content.get("text"):
+        content_parts.append({
+            "type": "text",
+            "text": extracted_content["text"]
+        })
+    
+    # Add images if available
+    for img in extracted_content.get("images", []):
+        if img.get("data"):
+            # Extract the base64 data without the MIME prefix
+            img_data = img["data"].split("base64,")[1] if "base64," in img["data"] else img["data"]
+            
+            content_parts.append({
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": img["data"].split(";")[0].split(":")[1] if ":" in img["data"] else "image/jpeg",
+                    "data": img_data
+                }
+            })
+    
+    return content_parts
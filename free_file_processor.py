@@ -6,42 +6,206 @@ using open-source libraries.
 
 import os
 import logging
-import base64
-from io import BytesIO
-from typing import Dict, Any, List, Optional
-from PIL import Image
 import re
+import copy
+import hashlib
+import uuid
+import threading
+import asyncio
+try:
+    # SIMD-accelerated drop-in for the stdlib codec
+    import pybase64 as base64
+except ImportError:
+    import base64
+from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, Any, List, Optional, Tuple
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Logging is configured by the application entry point
 logger = logging.getLogger(__name__)
 
 # Constants
-ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
+ALLOWED_EXTENSIONS = frozenset({'pdf', 'png', 'jpg', 'jpeg'})
 UPLOAD_FOLDER = 'uploads'
+# Formats browsers display natively; these are embedded without re-encoding.
+# PIL reports most camera JPEGs as MPO, which is a plain JPEG to a browser.
+BROWSER_IMAGE_FORMATS = {'JPEG', 'MPO', 'PNG', 'GIF', 'WEBP'}
+# MIME subtype for each PIL format name
+_MIME = {'JPG': 'jpeg', 'JPEG': 'jpeg', 'MPO': 'jpeg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# PDFs with at least this many pages are extracted across worker processes; enhanced_file_processor uses the same threshold
+PARALLEL_PAGE_THRESHOLD = 16
+# Inlined images above this many pixels are downscaled to fit INLINE_MAX_DIMENSION
+MAX_INLINE_PIXELS = 1_000_000
+INLINE_MAX_DIMENSION = 1024
+# Uploads are read and hashed in chunks of this many bytes while being saved
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Processed results keyed by (SHA-256 of contents, path, extension, binary), least recently used first;
+# the path is part of the key because results name the file they came from
+PROCESSED_CACHE_SIZE = 32
+_processed_cache = OrderedDict()
+_processed_cache_lock = threading.Lock()
+
+# Keys of a processing result that are passed on to the model
+_MODEL_CONTENT_KEYS = ("text", "images")
+
+# Leading bytes identifying each supported file type, and the type each extension must contain
+_FILE_SIGNATURES = ((b'\x89PNG', 'png'), (b'\xff\xd8\xff', 'jpeg'), (b'%PDF', 'pdf'))
+_EXTENSION_TYPES = {'png': 'png', 'jpg': 'jpeg', 'jpeg': 'jpeg', 'pdf': 'pdf'}
+
+# Set once ensure_upload_dir has created UPLOAD_FOLDER
+_upload_dir_ready = False
+
+# Worker processes for process_file_async, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+# Set in those worker processes, which extract PDF pages serially rather than
+# starting a nested pool per file
+_in_pool_worker = False
+
+# Saved uploads are named after the SHA-256 of their contents
+_DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')
 
 def allowed_file(filename: str) -> bool:
     """Check if the file extension is allowed."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1][1:].lower() in ALLOWED_EXTENSIONS
 
 def ensure_upload_dir() -> None:
-    """Ensure the upload directory exists."""
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
+    """Ensure the upload directory exists; only the first call touches the filesystem."""
+    global _upload_dir_ready
+    if not _upload_dir_ready:
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        _upload_dir_ready = True
         
 def save_uploaded_file(file, filename: str) -> str:
-    """Save an uploaded file to the upload directory."""
+    """
+    Save an uploaded file to the upload directory.
+    
+    The upload is hashed while it is streamed to disk and stored as
+    <sha256>.<ext>, so identical uploads share one file.
+    
+    Args:
+        file: Uploaded file object exposing a readable stream
+        filename: Original filename, used only for its extension
+        
+    Returns:
+        Path to the saved file
+    """
     ensure_upload_dir()
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
+    ext = os.path.splitext(filename)[1].lower()
+    sha256 = hashlib.sha256()
+    
+    # A fresh, exclusively created name with mode 0666, so the process umask
+    # applies exactly as it would for a plain open()
+    tmp_path = os.path.join(UPLOAD_FOLDER, uuid.uuid4().hex + '.part')
+    fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+                tmp.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    
+    filepath = os.path.join(UPLOAD_FOLDER, sha256.hexdigest() + ext)
+    if os.path.exists(filepath):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, filepath)
     return filepath
 
-def process_image_file(filepath: str) -> Dict[str, Any]:
+def _read_header(filepath: str) -> Tuple[Tuple[int, int], str, str]:
+    """Return (size, format, mode) of an image; PIL reads only the header, no pixels are decoded."""
+    from PIL import Image
+    
+    with Image.open(filepath) as img:
+        return img.size, img.format, img.mode
+
+@lru_cache(maxsize=1)
+def _get_pyvips():
+    """Return the pyvips module if libvips is available, else None."""
+    try:
+        import pyvips
+    except (ImportError, OSError):
+        return None
+    return pyvips
+
+def _image_bytes(filepath: str, format_type: str, size: Tuple[int, int], mode: str) -> Tuple[Any, str]:
+    """
+    Return the encoded image bytes to hand to the model or browser.
+    
+    Browser-ready files of up to MAX_INLINE_PIXELS are read straight from
+    disk, so PNGs are never re-compressed. Larger images are downscaled to
+    fit INLINE_MAX_DIMENSION (with libvips when pyvips is installed, else
+    PIL), CMYK images are converted to RGB, and anything else is decoded
+    and re-encoded as PNG.
+    
+    Args:
+        filepath: Path to the image file
+        format_type: Image format as reported by _read_header
+        size: Image (width, height) as reported by _read_header
+        mode: Image color mode as reported by _read_header
+        
+    Returns:
+        Tuple of (bytes-like object, format of the encoded bytes)
+    """
+    width, height = size
+    oversized = width * height > MAX_INLINE_PIXELS
+    
+    if format_type in BROWSER_IMAGE_FORMATS and mode != 'CMYK' and not oversized:
+        with open(filepath, 'rb') as f:
+            return f.read(), format_type
+    
+    img_format = 'JPEG' if format_type in ('JPEG', 'MPO') else 'PNG'
+    
+    pyvips = _get_pyvips()
+    if oversized and mode != 'CMYK' and pyvips is not None:
+        # Load and shrink in one streaming pass; JPEGs shrink on load
+        thumbnail = pyvips.Image.thumbnail(filepath, INLINE_MAX_DIMENSION, height=INLINE_MAX_DIMENSION)
+        suffix = '.jpg[Q=85]' if img_format == 'JPEG' else '.png'
+        return thumbnail.write_to_buffer(suffix), img_format
+    
+    from PIL import Image
+    
+    buffered = BytesIO()
+    with Image.open(filepath) as img:
+        if oversized:
+            # JPEG can decode at a reduced scale, skipping most of the pixels
+            if img_format == 'JPEG':
+                img.draft(img.mode, (INLINE_MAX_DIMENSION, INLINE_MAX_DIMENSION))
+            img.thumbnail((INLINE_MAX_DIMENSION, INLINE_MAX_DIMENSION), Image.LANCZOS)
+        # Browsers render CMYK JPEGs inconsistently
+        if img.mode == 'CMYK':
+            img = img.convert('RGB')
+        img.save(buffered, format=img_format)
+    # getbuffer() exposes the encoded bytes without getvalue()'s copy
+    return buffered.getbuffer(), img_format
+
+def to_data_uri(image: Dict[str, Any]) -> str:
+    """
+    Return an image entry from process_image_file as a data URI.
+    
+    Args:
+        image: Entry of a result's "images" list, inline or binary
+        
+    Returns:
+        data:image/...;base64 URI
+    """
+    if "data" in image:
+        return image["data"]
+    return "data:image/" + image["mime"] + ";base64," + base64.b64encode(image["bytes"]).decode('ascii')
+
+def process_image_file(filepath: str, binary: bool = False) -> Dict[str, Any]:
     """
     Process an image file and extract basic information.
     
     Args:
         filepath: Path to the image file
+        binary: Keep the encoded image as raw bytes with its MIME type for
+            in-process consumers; use to_data_uri at the HTTP boundary
         
     Returns:
         Dict containing image data
@@ -52,31 +216,35 @@ def process_image_file(filepath: str) -> Dict[str, Any]:
     }
     
     try:
-        # Open and process the image
-        with Image.open(filepath) as img:
-            # Get basic image information
-            width, height = img.size
-            format_type = img.format
-            mode = img.mode
-            
-            # Add basic description
-            result["text"] = f"Image: {os.path.basename(filepath)}\nFormat: {format_type}\nDimensions: {width}x{height} pixels\nColor mode: {mode}"
-            
-            # Convert image to base64
-            buffered = BytesIO()
-            img_format = img.format if img.format else 'JPEG'
-            img.save(buffered, format=img_format)
-            img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
-            
-            mime_type = 'jpeg' if img_format.lower() == 'jpg' else img_format.lower()
-            img_data = f"data:image/{mime_type};base64,{img_str}"
-            
+        # Get basic image information from the header alone
+        (width, height), format_type, mode = _read_header(filepath)
+        
+        # Add basic description
+        result["text"] = f"Image: {os.path.basename(filepath)}\nFormat: {format_type}\nDimensions: {width}x{height} pixels\nColor mode: {mode}"
+        
+        # The MIME type follows the format of the bytes actually embedded:
+        # the header's format for pass-through files, else the re-encode target
+        raw, img_format = _image_bytes(filepath, format_type, (width, height), mode)
+        mime_type = _MIME.get(img_format, 'jpeg')
+        
+        if binary:
             result["images"].append({
-                "data": img_data,
+                "bytes": bytes(raw),
+                "mime": mime_type,
                 "width": width,
                 "height": height,
                 "format": format_type
             })
+            return result
+        
+        img_data = to_data_uri({"bytes": raw, "mime": mime_type})
+        
+        result["images"].append({
+            "data": img_data,
+            "width": width,
+            "height": height,
+            "format": format_type
+        })
             
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
@@ -84,34 +252,99 @@ def process_image_file(filepath: str) -> Dict[str, Any]:
     
     return result
 
+def _extract_pages_text(filepath: str, start: int, stop: int) -> str:
+    """Extract the text of pages [start, stop); run in worker processes, which need their own handle."""
+    import fitz  # PyMuPDF
+    
+    with fitz.open(filepath) as pdf_document:
+        return "\n".join(pdf_document[page_num].get_text() for page_num in range(start, stop))
+
 def process_pdf_file(filepath: str) -> Dict[str, Any]:
     """
-    Process a PDF file with minimal extraction.
+    Process a PDF file and extract its text.
+    
+    Documents with PARALLEL_PAGE_THRESHOLD or more pages are split into
+    one contiguous page range per worker process, unless this is already
+    a worker of the shared pool.
     
     Args:
         filepath: Path to the PDF file
         
     Returns:
-        Dict with basic PDF info
+        Dict with the PDF's text content
     """
     result = {
-        "text": f"PDF file: {os.path.basename(filepath)}\n" +
-                f"Note: Detailed PDF content extraction requires additional libraries. " +
-                f"Basic analysis will be provided based on your query.",
+        "text": "",
         "images": []
     }
     
-    # For a full implementation, you would use libraries like PyPDF2 or PDF.js
-    # but we're keeping it minimal for simplicity
+    try:
+        import fitz  # PyMuPDF
+        
+        with fitz.open(filepath) as pdf_document:
+            page_count = pdf_document.page_count
+            parallel = page_count >= PARALLEL_PAGE_THRESHOLD and not _in_pool_worker
+            if not parallel:
+                extracted_text = "\n".join(page.get_text() for page in pdf_document).strip()
+        
+        if parallel:
+            workers = min(os.cpu_count() or 1, page_count)
+            bounds = [page_count * i // workers for i in range(workers + 1)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = executor.map(_extract_pages_text, [filepath] * workers, bounds[:-1], bounds[1:])
+                extracted_text = "\n".join(chunks).strip()
+        
+        result["text"] = f"PDF file: {os.path.basename(filepath)}\nPages: {page_count}\n\n"
+        if extracted_text:
+            result["text"] += extracted_text
+        else:
+            result["text"] += "No extractable text found; the PDF may contain only scanned images."
+            
+    except Exception as e:
+        logger.error(f"Error processing PDF: {str(e)}")
+        result["error"] = str(e)
     
     return result
 
-def process_file(filepath: str) -> Dict[str, Any]:
+def sniff_file_type(filepath: str) -> Optional[str]:
+    """
+    Identify a file's type from its leading bytes rather than its name.
+    
+    Args:
+        filepath: Path to the file
+        
+    Returns:
+        'png', 'jpeg' or 'pdf', or None if the content is none of these
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(8)
+    for signature, file_type in _FILE_SIGNATURES:
+        if header.startswith(signature):
+            return file_type
+    return None
+
+def _file_digest(filepath: str) -> str:
+    """Return the SHA-256 hex digest of a file, taken from its name when it was saved by save_uploaded_file."""
+    directory, name = os.path.split(os.path.abspath(filepath))
+    stem = os.path.splitext(name)[0]
+    # Only files this module saved into UPLOAD_FOLDER are named after their digest
+    if directory == os.path.abspath(UPLOAD_FOLDER) and _DIGEST_PATTERN.fullmatch(stem):
+        return stem
+    with open(filepath, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def process_file(filepath: str, binary: bool = False) -> Dict[str, Any]:
     """
-    Process a file based on its extension.
+    Process a file based on its extension, after checking that its content
+    matches that extension.
+    
+    Results are cached by file content and path, so duplicate uploads, which
+    save_uploaded_file stores under one digest name, are returned without
+    being processed again.
     
     Args:
         filepath: Path to the file
+        binary: Keep images as raw bytes with their MIME type
         
     Returns:
         Dict with extracted content
@@ -119,11 +352,83 @@ def process_file(filepath: str) -> Dict[str, Any]:
     file_ext = filepath.rsplit('.', 1)[1].lower() if '.' in filepath else ''
     
     if file_ext in ['jpg', 'jpeg', 'png']:
-        return process_image_file(filepath)
+        processor = lambda path: process_image_file(path, binary=binary)
     elif file_ext == 'pdf':
-        return process_pdf_file(filepath)
+        processor = process_pdf_file
     else:
         return {"error": f"Unsupported file type: {file_ext}"}
+    
+    # Reject files whose content does not match their extension before any parser sees them
+    try:
+        if sniff_file_type(filepath) != _EXTENSION_TYPES[file_ext]:
+            return {"error": f"File content does not match its .{file_ext} extension"}
+    except OSError as e:
+        logger.error(f"Error reading file: {str(e)}")
+        return {"error": str(e)}
+    
+    try:
+        cache_key = (_file_digest(filepath), os.path.abspath(filepath), file_ext, binary)
+    except OSError as e:
+        logger.error(f"Error hashing file: {str(e)}")
+        return processor(filepath)
+    
+    with _processed_cache_lock:
+        cached = _processed_cache.get(cache_key)
+        if cached is not None:
+            _processed_cache.move_to_end(cache_key)
+            return copy.deepcopy(cached)
+    
+    result = processor(filepath)
+    
+    # Only cache successful results so transient failures can be retried
+    if "error" not in result:
+        with _processed_cache_lock:
+            _processed_cache[cache_key] = copy.deepcopy(result)
+            if len(_processed_cache) > PROCESSED_CACHE_SIZE:
+                _processed_cache.popitem(last=False)
+    
+    return result
+
+def _mark_pool_worker() -> None:
+    """Pool initializer: keep PDF extraction in this worker process serial."""
+    global _in_pool_worker
+    _in_pool_worker = True
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Return the shared worker pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Each task already holds one file, so nested page pools would only oversubscribe the CPUs
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_mark_pool_worker)
+        return _executor
+
+async def process_file_async(filepath: str, binary: bool = False) -> Dict[str, Any]:
+    """
+    Process a file in a worker process without blocking the event loop.
+    
+    Args:
+        filepath: Path to the file
+        binary: Keep images as raw bytes with their MIME type
+        
+    Returns:
+        Dict with extracted content
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(process_file, filepath, binary))
+
+async def process_files_async(filepaths: List[str], binary: bool = False) -> List[Dict[str, Any]]:
+    """
+    Process several files concurrently across the worker pool.
+    
+    Args:
+        filepaths: Paths to the files
+        binary: Keep images as raw bytes with their MIME type
+        
+    Returns:
+        List of result dicts in the same order as filepaths
+    """
+    return list(await asyncio.gather(*(process_file_async(filepath, binary) for filepath in filepaths)))
 
 def prepare_for_model(extracted_content: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -135,14 +440,4 @@ def prepare_for_model(extracted_content: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Dict with prepared content for the model
     """
-    prepared_content = {}
-    
-    # Add text if available
-    if "text" in extracted_content and extracted_content["text"]:
-        prepared_content["text"] = extracted_content["text"]
-    
-    # Add images if available
-    if "images" in extracted_content and extracted_content["images"]:
-        prepared_content["images"] = extracted_content["images"]
-    
-    return prepared_content
\ No newline at end of file
+    return {key: extracted_content[key] for key in _MODEL_CONTENT_KEYS if extracted_content.get(key)}
\ No newline at end of file